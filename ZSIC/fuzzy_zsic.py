@@ -1,13 +1,36 @@
-from typing import List, Union
+from typing import List, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import io
+import threading
 import torch
+import torch.nn.functional as F
+import torchvision.transforms.v2 as T
 import clip
 import PIL
-from PIL import Image
+from PIL import Image, ImageOps
 import requests
+import requests.adapters
 import numpy as np
 import os
-from sentence_transformers import SentenceTransformer, util
-from fuzzywuzzy import fuzz
+from sentence_transformers import SentenceTransformer
+from rapidfuzz import fuzz, process
+
+CLIP_MEAN = (0.48145466, 0.4578275, 0.40821073)
+CLIP_STD = (0.26862954, 0.26130258, 0.27577711)
+
+# Concurrent image downloads per batch, also the connection pool size of the session
+MAX_DOWNLOAD_WORKERS = 16
+
+
+@functools.lru_cache(maxsize=None)
+def _turbojpeg():
+    """Returns a shared TurboJPEG decoder, or None if PyTurboJPEG / libjpeg-turbo is not installed"""
+    try:
+        from turbojpeg import TurboJPEG
+        return TurboJPEG()
+    except (ImportError, OSError, RuntimeError):
+        return None
 
 class FuzzyZeroShotImageClassification():
 
@@ -26,6 +49,16 @@ class FuzzyZeroShotImageClassification():
               ar, bg, ca, cs, da, de, el, es, et, fa, fi, fr, fr-ca, gl, gu, he, hi, hr, hu,
               hy, id, it, ja, ka, ko, ku, lt, lv, mk, mn, mr, ms, my, nb, nl, pl, pt, pt, pt-br,
               ro, ru, sk, sl, sq, sr, sv, th, tr, uk, ur, vi, zh-cn, zh-tw.
+            Compile (`bool`, *optional*, defaults to `True`):
+              Compile the encoders with `torch.compile` when running on GPU.
+            Timeout (`float`, *optional*, defaults to 30):
+              Seconds to wait for an image URL to respond before failing.
+            Quantize (`bool`, *optional*, defaults to `True`):
+              Apply dynamic int8 quantization to the Linear layers when running on CPU.
+            Max_batch (`int`, *optional*, defaults to 32):
+              Number of images of the pre-allocated CLIP input buffer. Larger batches allocate their own tensor.
+            Cuda_graphs (`bool`, *optional*, defaults to `True`):
+              Replay the CLIP image encoder from CUDA graphs captured per batch size when running on GPU.
         """
 
         if "lang" in kwargs:
@@ -39,22 +72,104 @@ class FuzzyZeroShotImageClassification():
             raise Exception('Language code {} not valid, supported codes are {} '.format(self.lang, lang_codes))
             return
 
-        device = "cuda:0" if torch.cuda.is_available() else "cpu"
+        self.device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
 
         if self.lang == "en":
             model_tag = "ViT-B/32"
             if "model" in kwargs:
                 model_tag = kwargs["model"]
             print("Loading OpenAI CLIP model {} ...".format(model_tag))
-            self.model, self.preprocess = clip.load(model_tag, device=device)
+            self.model, self.preprocess = clip.load(model_tag, device=self.device)
             print("Label language {} ...".format(self.lang))
+
+            # Same steps as the PIL based `self.preprocess`, but run on the image tensor once it is on the GPU
+            self.preprocess_gpu = None
+            n_px = self.model.visual.input_resolution
+            if self.device.type == "cuda":
+                self.preprocess_gpu = T.Compose([
+                    T.Resize(n_px, interpolation=T.InterpolationMode.BICUBIC, antialias=True),
+                    T.CenterCrop(n_px),
+                    T.ToDtype(torch.float32, scale=True),
+                    T.Normalize(mean=CLIP_MEAN, std=CLIP_STD),
+                ])
+
+            # Preprocessed batches are written into this buffer instead of allocating a new one per call
+            max_batch = kwargs.get("max_batch", 32)
+            self._img_buffer = torch.empty(max_batch, 3, n_px, n_px, device=self.device)
+            # The buffer (and the CUDA graph outputs below) are shared state, calls encode one at a time
+            self._encode_lock = threading.Lock()
+
+            # CUDA graphs of the image encoder, captured lazily per power of two batch size over `self._img_buffer`.
+            # All captures share one memory pool so their activations are not each kept resident.
+            self._graphs = {} if self.device.type == "cuda" and kwargs.get("cuda_graphs", True) else None
+            self._graph_pool = torch.cuda.graph_pool_handle() if self._graphs is not None else None
         else:
             model_tag = "clip-ViT-B-32"
             print("Loading sentence transformer model {} ...".format(model_tag))
-            self.model = SentenceTransformer('clip-ViT-B-32', device=device)
-            self.text_model = SentenceTransformer('sentence-transformers/clip-ViT-B-32-multilingual-v1', device=device)
+            self.model = SentenceTransformer('clip-ViT-B-32', device=self.device)
+            self.text_model = SentenceTransformer('sentence-transformers/clip-ViT-B-32-multilingual-v1', device=self.device)
             print("Label language {} ...".format(self.lang))
 
+        # Reuse TCP/TLS connections across image downloads
+        self._session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=MAX_DOWNLOAD_WORKERS)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self.timeout = kwargs.get("timeout", 30)
+
+        # Inference only: disable dropout and other training-time behaviour once
+        self.model.eval()
+
+        # On CPU, run the Linear layers of the encoders with dynamic int8 quantization
+        if self.device.type == "cpu" and kwargs.get("quantize", True):
+            if str(type(self.model)) == "<class 'clip.model.CLIP'>":
+                # Only the transformer towers: the ResNet attention pool reads its Linear weights as tensors
+                for owner in (self.model, self.model.visual):
+                    if hasattr(owner, "transformer"):
+                        owner.transformer = torch.ao.quantization.quantize_dynamic(
+                            owner.transformer, {torch.nn.Linear}, dtype=torch.qint8
+                        )
+            else:
+                self.model = torch.ao.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+                self.text_model = torch.ao.quantization.quantize_dynamic(
+                    self.text_model.eval(), {torch.nn.Linear}, dtype=torch.qint8
+                )
+
+        # Fuse kernels of the encoders on GPU, keeping eager execution if torch.compile is unavailable or fails
+        if self.device.type == "cuda" and kwargs.get("compile", True):
+            self._compile_model()
+
+        # Text features only depend on the (templated) labels, so they are memoized per instance
+        self._text_cache = functools.lru_cache(maxsize=32)(self._encode_labels)
+
+    def _compile_model(self):
+        """
+        Compiles the vision and text encoders with `torch.compile` and warms them up once, so the first
+        call does not pay the compilation cost. Falls back to the eager modules on any failure.
+        """
+        if str(type(self.model)) == "<class 'clip.model.CLIP'>":
+            # Text features are cached and encoded per length bucket by `_encode_text`, only the image tower is hot
+            modules = [(self.model, "visual")]
+        else:
+            # CLIPModel.forward calls `model.vision_model` directly, so that is the module to replace
+            modules = [(self.model._first_module().model, "vision_model"), (self.text_model._first_module(), "auto_model")]
+        eager = [(owner, name, getattr(owner, name)) for owner, name in modules if hasattr(owner, name)]
+
+        try:
+            for owner, name, module in eager:
+                setattr(owner, name, torch.compile(module))
+            with torch.inference_mode(), torch.autocast("cuda", dtype=torch.float16):
+                if str(type(self.model)) == "<class 'clip.model.CLIP'>":
+                    n_px = self.model.visual.input_resolution
+                    self.model.encode_image(torch.zeros(1, 3, n_px, n_px, device=self.device))
+                else:
+                    self.model.encode(PIL.Image.new("RGB", (224, 224)))
+                    self.text_model.encode(["warmup"])
+        except Exception as e:
+            print("torch.compile unavailable, running eagerly ({}) ...".format(e))
+            for owner, name, module in eager:
+                setattr(owner, name, module)
+
     def available_models(self):
         """Returns the names of available CLIP models"""
         return clip.available_models()
@@ -66,6 +181,42 @@ class FuzzyZeroShotImageClassification():
         ro, ru, sk, sl, sq, sr, sv, th, tr, uk, ur, vi, zh-cn, zh-tw"""
         return set([code.strip() for code in codes.split(",")])
 
+    def _is_url(self, image) -> bool:
+        return isinstance(image, str) and (image.startswith("http://") or image.startswith("https://"))
+
+    def _fetch_bytes(self, url: str) -> bytes:
+        """
+        Downloads the raw content of `url` with the instance session.
+        Args:
+            url (`str`):
+                URL of the image, starting with `http://` or `https://`.
+        Returns:
+            `bytes`: The encoded image.
+        """
+        response = self._session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        return response.content
+
+    def _decode_image(self, data: bytes) -> "PIL.Image.Image":
+        """
+        Decodes encoded image bytes to a PIL Image.
+        Plain RGB / grayscale JPEGs are decoded with libjpeg-turbo when PyTurboJPEG is installed, everything
+        else (and JPEGs with an EXIF orientation, which must stay readable) goes through PIL.
+        Args:
+            data (`bytes`):
+                The encoded image.
+        Returns:
+            `PIL.Image.Image`: A PIL Image.
+        """
+        # Opening only parses the header, pixels are decoded lazily
+        image = PIL.Image.open(io.BytesIO(data))
+        if data[:2] == b"\xff\xd8" and image.mode in ("RGB", "L") and image.getexif().get(274, 1) == 1:
+            jpeg = _turbojpeg()
+            if jpeg is not None:
+                from turbojpeg import TJPF_RGB
+                return PIL.Image.fromarray(jpeg.decode(data, pixel_format=TJPF_RGB))
+        return image
+
     def _load_image(self, image: str) -> "PIL.Image.Image":
         """
         Loads `image` to a PIL Image.
@@ -76,10 +227,11 @@ class FuzzyZeroShotImageClassification():
             `PIL.Image.Image`: A PIL Image.
         """
         if isinstance(image, str):
-            if image.startswith("http://") or image.startswith("https://"):
-                image = PIL.Image.open(requests.get(image, stream=True).raw)
+            if self._is_url(image):
+                image = self._decode_image(self._fetch_bytes(image))
             elif os.path.isfile(image):
-                image = PIL.Image.open(image)
+                with open(image, "rb") as f:
+                    image = self._decode_image(f.read())
             else:
                 raise ValueError(
                     f"Incorrect path or url, URLs must start with `http://` or `https://`, and {image} is not a valid path"
@@ -90,10 +242,137 @@ class FuzzyZeroShotImageClassification():
             raise ValueError(
                 "Incorrect format used for image. Should be an url linking to an image, a local path, or a PIL image."
             )
-        image = PIL.ImageOps.exif_transpose(image)
-        image = image.convert("RGB")
+        # Both are full image passes, skip them when the image is already upright RGB (274 is EXIF Orientation)
+        if image.getexif().get(274, 1) != 1:
+            image = PIL.ImageOps.exif_transpose(image)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
         return image
 
+    def _preprocess(self, image: "PIL.Image.Image") -> torch.Tensor:
+        """
+        Preprocesses a RGB PIL Image into a CLIP input tensor.
+        Resize, crop and normalization run on the GPU when available, otherwise the PIL based
+        `self.preprocess` from `clip.load` is used.
+        Args:
+            image (`PIL.Image.Image`):
+                The RGB image to preprocess.
+        Returns:
+            `torch.Tensor`: A `(3, H, W)` float tensor.
+        """
+        if self.preprocess_gpu is None:
+            return self.preprocess(image)
+        img = T.functional.pil_to_tensor(image).to(self.device, non_blocking=True)
+        return self.preprocess_gpu(img)
+
+    def _capture_graph(self, img: torch.Tensor):
+        """
+        Captures `self.model.encode_image` on the static input `img` into a CUDA graph.
+        Returns:
+            A tuple of the `torch.cuda.CUDAGraph` and its static output tensor, or `None` if capture failed.
+        """
+        try:
+            # Warm up on a side stream first, under the same autocast state as the capture, so any torch.compile
+            # (re)compilation for that state happens here and not inside the capture
+            stream = torch.cuda.Stream()
+            stream.wait_stream(torch.cuda.current_stream())
+            with torch.cuda.stream(stream), torch.autocast("cuda", dtype=torch.float16, cache_enabled=False):
+                for _ in range(3):
+                    self.model.encode_image(img)
+            torch.cuda.current_stream().wait_stream(stream)
+
+            graph = torch.cuda.CUDAGraph()
+            with torch.cuda.graph(graph, pool=self._graph_pool), torch.autocast(
+                "cuda", dtype=torch.float16, cache_enabled=False
+            ):
+                image_features = self.model.encode_image(img)
+            return graph, image_features
+        except Exception as e:
+            print("CUDA graph capture failed for batch size {}, running eagerly ({}) ...".format(img.shape[0], e))
+            return None
+
+    def _encode_image(self, img: torch.Tensor) -> torch.Tensor:
+        """
+        Runs `self.model.encode_image`, replaying a captured CUDA graph when `img` lives in `self._img_buffer`.
+        The batch is padded up to the next power of two (capped at the buffer size) so only a few graphs are
+        captured. The returned tensor is a view of the graph output and is overwritten by the next replay.
+        Args:
+            img (`torch.Tensor`):
+                The preprocessed `(B, 3, H, W)` batch.
+        Returns:
+            `torch.Tensor`: The image features, one row per image.
+        """
+        if self._graphs is None or img.data_ptr() != self._img_buffer.data_ptr():
+            return self.model.encode_image(img)
+
+        batch_size = img.shape[0]
+        # Rows past `batch_size` hold stale data, images are encoded independently so they only cost compute
+        padded_size = min(1 << (batch_size - 1).bit_length(), self._img_buffer.shape[0])
+        if padded_size not in self._graphs:
+            self._graphs[padded_size] = self._capture_graph(self._img_buffer[:padded_size])
+        if self._graphs[padded_size] is None:
+            return self.model.encode_image(img)
+
+        graph, image_features = self._graphs[padded_size]
+        graph.replay()
+        return image_features[:batch_size]
+
+    def _encode_text(self, text: torch.Tensor, num_buckets: int = 4) -> torch.Tensor:
+        """
+        Equivalent of `self.model.encode_text` that does not run attention over the padding.
+        `clip.tokenize` pads every label to the 77 token context, but the causal mask means tokens after the
+        end-of-text token never influence its output. Labels are therefore grouped into length buckets and each
+        bucket is run trimmed to its longest label.
+        Args:
+            text (`torch.Tensor`):
+                Tokens from `clip.tokenize`, shape `(N, 77)`.
+            num_buckets (`int`, *optional*, defaults to 4):
+                Maximum number of length buckets.
+        Returns:
+            `torch.Tensor`: The text features, in the same order as `text`.
+        """
+        model = self.model
+        # The end-of-text token has the highest id, its position gives the true length
+        eot = text.argmax(dim=-1)
+        order = torch.argsort(eot)
+        text_features = torch.empty(text.shape[0], model.text_projection.shape[1], device=text.device)
+        attn_mask = model.build_attention_mask().to(text.device)
+
+        for idx in torch.tensor_split(order, min(num_buckets, text.shape[0])):
+            seq_len = int(eot[idx].max()) + 1
+            x = model.token_embedding(text[idx, :seq_len]).type(model.dtype)
+            x = x + model.positional_embedding[:seq_len].type(model.dtype)
+            x = x.permute(1, 0, 2)  # NLD -> LND
+            mask = attn_mask[:seq_len, :seq_len].to(x.dtype)
+            for block in model.transformer.resblocks:
+                y = block.ln_1(x)
+                x = x + block.attn(y, y, y, need_weights=False, attn_mask=mask)[0]
+                x = x + block.mlp(block.ln_2(x))
+            x = x.permute(1, 0, 2)  # LND -> NLD
+            x = model.ln_final(x).type(model.dtype)
+            text_features[idx] = (x[torch.arange(x.shape[0]), eot[idx]] @ model.text_projection).float()
+        return text_features
+
+    def _encode_labels(self, labels: Tuple[str, ...]) -> torch.Tensor:
+        """
+        Encodes `labels` into L2-normalized text features.
+        Called through `self._text_cache` so repeated label sets skip the text encoder.
+        Args:
+            labels (`Tuple[str, ...]`):
+                The hypothesis-templated labels to encode.
+        Returns:
+            `torch.Tensor`: The normalized text features, one row per label.
+        """
+        with torch.inference_mode(), torch.autocast("cuda", dtype=torch.float16, enabled=self.device.type == "cuda"):
+            if str(type(self.model)) == "<class 'clip.model.CLIP'>":
+                text = clip.tokenize(list(labels)).to(self.device)
+                text_features = F.normalize(self._encode_text(text), dim=-1)
+            else:
+                text_features = self.text_model.encode(
+                    list(labels), batch_size=32, convert_to_tensor=True, device=self.device, normalize_embeddings=True
+                )
+            return text_features.float()
+
     def fuzzy_match(self, candidate_label, labels, threshold=80):
         """
         Performs fuzzy matching with a confidence threshold.
@@ -110,97 +389,167 @@ class FuzzyZeroShotImageClassification():
                 - best_match_score (`int`): The fuzzy score of the best match (0-100).
         """
 
-        best_match_score = 0
-        best_match = None
-        for label in labels:
-            match_score = fuzz.partial_ratio(candidate_label, label)
-            if match_score > best_match_score and match_score >= threshold:
-                best_match_score = match_score
-                best_match = label
-        return best_match, best_match_score
+        # extractOne prunes labels that cannot reach the cutoff and stops at the first perfect score.
+        # Scores are rounded half up before the threshold applies, like the uint8 matrix of `_fuzzy_match_labels`.
+        match = process.extractOne(
+            candidate_label, labels, scorer=fuzz.partial_ratio, processor=None, score_cutoff=threshold - 0.5
+        )
+        if match is None:
+            return None, 0
+        best_match, best_match_score, _ = match
+        return best_match, int(best_match_score + 0.5)
 
-    def __call__(self, image: str, candidate_labels: Union[str, List[str]], *args, **kwargs):
+    def _fuzzy_match_labels(self, candidate_labels, labels, threshold=80):
         """
-        Classify the image using the candidate labels given
+        Fuzzy matches every candidate label against `labels` in a single vectorized pass.
 
         Args:
-            image (`str`):
-                Fully Qualified path of a local image or URL of image
+            candidate_labels (`List[str]`): The candidate labels to match.
+            labels (`List[str]`): The list of labels to compare with.
+            threshold (`int`, *optional*, defaults to 80):
+                The minimum fuzzy matching score (out of 100) to consider a match.
+
+        Returns:
+            A tuple containing:
+                - best_matches (`List[str]`): For each candidate, the label with the highest fuzzy score that meets
+                  the threshold, or `None`.
+                - best_match_scores (`np.ndarray`): The fuzzy score of each best match (0 when there is none).
+        """
+
+        # Labels templated from the candidates contain their own candidate verbatim, so every candidate has a
+        # perfect score and its best match is simply the first label with the shorter string inside the longer one
+        if len(candidate_labels) == len(labels) and all(
+            candidate and candidate in label for candidate, label in zip(candidate_labels, labels)
+        ):
+            best_matches = [
+                next(
+                    label for label in labels
+                    if (candidate in label if len(candidate) <= len(label) else label in candidate)
+                )
+                for candidate in candidate_labels
+            ]
+            return best_matches, np.full(len(candidate_labels), 100, dtype=np.uint8)
+
+        # (num_candidates, num_labels) similarity matrix computed in one call
+        scores = process.cdist(
+            candidate_labels, labels, scorer=fuzz.partial_ratio, processor=None, dtype=np.uint8, workers=-1
+        )
+        best_idx = scores.argmax(axis=1)
+        best_match_scores = scores[np.arange(len(candidate_labels)), best_idx]
+        best_match_scores[best_match_scores < threshold] = 0
+        best_matches = [labels[idx] if score else None for idx, score in zip(best_idx, best_match_scores)]
+        return best_matches, best_match_scores
+
+    def __call__(
+        self,
+        image: Union[str, "PIL.Image.Image", List[Union[str, "PIL.Image.Image"]]],
+        candidate_labels: Union[str, List[str]],
+        *args,
+        **kwargs
+    ):
+        """
+        Classify the image(s) using the candidate labels given
+
+        Args:
+            image (`str`, `PIL.Image.Image` or `List`):
+                Fully Qualified path of a local image, URL of image or PIL image. A list of these is encoded
+                as a single batch and returns one result per image.
             candidate_labels (`str` or `List[str]`):
                 The set of possible class labels to classify each sequence into. Can be a single label, a string of
                 comma-separated labels, or a list of labels.
             hypothesis_template (`str`, *optional*, defaults to `"A photo of {}."`, if lang is default / `en`):
                 The template used to turn each label into a string. This template must include a {} or
                 similar syntax for the candidate label to be inserted into the template.
-            top_k (`int`, *optional*, defaults to 5):
+            top_k (`int`, *optional*, defaults to the number of labels):
                 The number of top labels that will be returned by the pipeline. If the provided number is higher than
                 the number of labels available in the model configuration, it will default to the number of labels.
+            batch_size (`int`, *optional*, defaults to 32):
+                Batch size used by the sentence transformer image encoder when lang is not `en`.
+
+        Instances keep a shared input buffer and CUDA graph outputs, concurrent calls from several threads are
+        serialized around the image encoding.
 
         Return:
             A `dict` or a list of `dict`: Each result comes as a dictionary with the following keys:
             - **image** (`str`) -- The image for which this is the output.
             - **scores** (`List[float]`) -- The probabilities for each of the labels.
+            - **labels** (`List[str]`) -- The top_k candidate labels, from most to least probable.
+            - **top_scores** (`List[float]`) -- The probabilities of those top_k labels.
             - **fuzzy_matched_labels** (`List[str]`) -- Fuzzy matched labels.
             - **highest_fuzzy_label** (`str`) -- The label with the highest fuzzy score.
             - **highest_score** (`float`) -- The highest score among the predicted labels.
         """
 
-        device = "cuda:0" if torch.cuda.is_available() else "cpu"
-
         if self.lang == "en":
             if "hypothesis_template" in kwargs:
                 hypothesis_template = kwargs["hypothesis_template"]
             else:
                 hypothesis_template = "A photo of {}"
-
-            if isinstance(candidate_labels, str):
-                labels = [hypothesis_template.format(candidate_label) for candidate_label in candidate_labels.split(",")]
-            else:
-                labels = [hypothesis_template.format(candidate_label) for candidate_label in candidate_labels]
         else:
             if "hypothesis_template" in kwargs:
                 hypothesis_template = kwargs["hypothesis_template"]
             else:
                 hypothesis_template = "{}"
 
-            if isinstance(candidate_labels, str):
-                labels = [hypothesis_template.format(candidate_label) for candidate_label in candidate_labels.split(",")]
-            else:
-                labels = [hypothesis_template.format(candidate_label) for candidate_label in candidate_labels]
+        if isinstance(candidate_labels, str):
+            candidate_labels = [candidate_label.strip() for candidate_label in candidate_labels.split(",")]
+
+        # A template with a single plain `{}` is filled by concatenation instead of going through str.format
+        if hypothesis_template.count("{") == 1 and hypothesis_template.count("}") == 1 and "{}" in hypothesis_template:
+            prefix, suffix = hypothesis_template.split("{}")
+            labels = [prefix + candidate_label + suffix for candidate_label in candidate_labels]
+        else:
+            labels = list(map(hypothesis_template.format, candidate_labels))
 
-        # TO BE IMPLEMENTED
         if "top_k" in kwargs:
-             top_k = kwargs["top_k"]
+            top_k = min(kwargs["top_k"], len(labels))
         else:
-             top_k = len(labels)
+            top_k = len(labels)
 
-        if str(type(self.model)) == "<class 'clip.model.CLIP'>":
-            img = self.preprocess(self._load_image(image)).unsqueeze(0).to(device)
-            text = clip.tokenize(labels).to(device)
-            image_features = self.model.encode_image(img)
-            text_features = self.model.encode_text(text)
+        single_image = not isinstance(image, (list, tuple))
+        images = [image] if single_image else list(image)
+        if not images:
+            return []
+
+        # Download all URL images of the batch concurrently, the rest is loaded as before
+        urls = list(dict.fromkeys(img for img in images if self._is_url(img)))
+        if len(urls) > 1:
+            with ThreadPoolExecutor(max_workers=min(MAX_DOWNLOAD_WORKERS, len(urls))) as executor:
+                fetched = dict(zip(urls, executor.map(self._fetch_bytes, urls)))
+            pil_images = [
+                self._load_image(self._decode_image(fetched[img]) if self._is_url(img) else img)
+                for img in images
+            ]
         else:
-            image_features = torch.tensor(self.model.encode(self._load_image(image)))
-            text_features = torch.tensor(self.text_model.encode(labels))
+            pil_images = [self._load_image(img) for img in images]
+
+        with torch.inference_mode(), torch.autocast("cuda", dtype=torch.float16, enabled=self.device.type == "cuda"):
+            if str(type(self.model)) == "<class 'clip.model.CLIP'>":
+                preprocessed = [self._preprocess(pil_image) for pil_image in pil_images]
+                with self._encode_lock:
+                    if len(preprocessed) <= self._img_buffer.shape[0]:
+                        img = torch.stack(preprocessed, out=self._img_buffer[:len(preprocessed)])
+                    else:
+                        img = torch.stack(preprocessed)
+                    # Normalizing in fp32 copies the features out of the (possibly shared) graph output
+                    image_features = F.normalize(self._encode_image(img).float(), dim=-1)
+            else:
+                batch_size = kwargs.get("batch_size", 32)
+                image_features = self.model.encode(
+                    pil_images, batch_size=batch_size, convert_to_tensor=True, device=self.device, normalize_embeddings=True
+                ).float()
+            text_features = self._text_cache(tuple(labels))
 
-        sim_scores = util.cos_sim(text_features, image_features)
-        out = []
-        for sim_score in sim_scores:
-            out.append(sim_score.item() * 100)
-        probs = torch.tensor([out])
-        probs = probs.softmax(dim=-1).cpu().numpy()
-        scores = list(probs.flatten())
+            # Both features are normalized fp32 (fp32 so the softmax below does not underflow), so the
+            # cosine similarity is a single matmul.
+            # (B, num_labels): one row of label similarities per image
+            sim_scores = image_features @ text_features.T
 
         # Fuzzy matching with threshold
-        fuzzy_matched_labels = []
-        highest_fuzzy_score = 0
-        highest_fuzzy_label = None
-        for candidate_label in candidate_labels:
-            fuzzy_matched_label, match_score = self.fuzzy_match(candidate_label, labels)
-            fuzzy_matched_labels.append(fuzzy_matched_label)
-            if match_score > highest_fuzzy_score:
-                highest_fuzzy_score = match_score
-                highest_fuzzy_label = fuzzy_matched_label
+        fuzzy_matched_labels, match_scores = self._fuzzy_match_labels(candidate_labels, labels)
+        highest_idx = match_scores.argmax()
+        highest_fuzzy_score = match_scores[highest_idx]
+        highest_fuzzy_label = fuzzy_matched_labels[highest_idx]
 
         # Handling potential false positives
         # 1. Confidence score threshold:
@@ -212,11 +561,25 @@ class FuzzyZeroShotImageClassification():
         # For example, if the highest_fuzzy_label is not among the top-k CLIP predictions,
         # consider it less reliable and prioritize the CLIP results.
 
-        preds = {}
-        preds["image"] = image
-        preds["scores"] = scores
-        preds["fuzzy_matched_labels"] = fuzzy_matched_labels
-        preds["highest_fuzzy_label"] = highest_fuzzy_label
-        preds["highest_score"] = max(scores)
+        # Scale before the softmax (it is not scale invariant), select the top_k on device and only then
+        # move the results to the host
+        probs = F.softmax(sim_scores * 100, dim=-1, dtype=torch.float32)
+        top_idx = torch.topk(probs, k=top_k, dim=-1).indices
+        probs, top_idx = probs.cpu().numpy(), top_idx.cpu().numpy()
+
+        results = []
+        for img, image_probs, image_idx in zip(images, probs, top_idx):
+            scores = list(image_probs)
+            top_scores = list(image_probs[image_idx])
+
+            preds = {}
+            preds["image"] = img
+            preds["scores"] = scores
+            preds["labels"] = [candidate_labels[idx] for idx in image_idx]
+            preds["top_scores"] = top_scores
+            preds["fuzzy_matched_labels"] = fuzzy_matched_labels
+            preds["highest_fuzzy_label"] = highest_fuzzy_label
+            preds["highest_score"] = max(scores)
+            results.append(preds)
 
-        return preds
+        return results[0] if single_image else results
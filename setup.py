@@ -1,9 +1,4 @@
 import setuptools
-import os
-
-# Install dependencies
-os.system("pip install git+https://github.com/openai/CLIP.git")
-os.system("pip install sentence-transformers")
 
 setuptools.setup(
     name="FuzzyZSIC",
@@ -13,16 +8,19 @@ setuptools.setup(
     packages=setuptools.find_packages(),
     install_requires=[
         "torch",
-        "clip",
+        "torchvision>=0.16",
+        "clip @ git+https://github.com/openai/CLIP.git",
         "Pillow",
         "requests",
         "numpy",
         "sentence-transformers",
-        "fuzzywuzzy",
-        "python-Levenshtein"
+        "rapidfuzz>=3.0"
     ],
+    extras_require={
+        "turbojpeg": ["PyTurboJPEG"],
+    },
+    python_requires=">=3.8",
     classifiers=[
-        "Programming Language :: Python :: 3.7",
         "License :: OSI Approved :: MIT License",
         "Operating System :: OS Independent",
     ],
@@ -0,0 +1,86 @@
+import types
+
+import pytest
+
+np = pytest.importorskip("numpy")
+torch = pytest.importorskip("torch")
+clip = pytest.importorskip("clip")
+rapidfuzz = pytest.importorskip("rapidfuzz")
+fuzzy_zsic = pytest.importorskip("ZSIC.fuzzy_zsic")
+
+from rapidfuzz import fuzz, process
+
+FuzzyZeroShotImageClassification = fuzzy_zsic.FuzzyZeroShotImageClassification
+
+
+def _cdist_match_labels(candidate_labels, labels, threshold=80):
+    """Reference: the `cdist` branch of `_fuzzy_match_labels`, without the templated fast path"""
+    scores = process.cdist(candidate_labels, labels, scorer=fuzz.partial_ratio, processor=None, dtype=np.uint8)
+    best_idx = scores.argmax(axis=1)
+    best_match_scores = scores[np.arange(len(candidate_labels)), best_idx]
+    best_match_scores[best_match_scores < threshold] = 0
+    best_matches = [labels[idx] if score else None for idx, score in zip(best_idx, best_match_scores)]
+    return best_matches, best_match_scores
+
+
+@pytest.mark.parametrize("template", ["A photo of {}", "{}", "{} photo", "x{}y"])
+@pytest.mark.parametrize(
+    "candidate_labels",
+    [
+        ["cat", "cats", "bobcat"],
+        ["bobcat", "cats", "cat"],
+        ["dog", "hot dog", "do"],
+        ["cat", "dog", "red square"],
+        ["an extremely long label here", "a", "bird"],
+    ],
+)
+def test_fuzzy_match_labels_templated_matches_cdist(template, candidate_labels):
+    labels = [template.format(candidate_label) for candidate_label in candidate_labels]
+
+    best_matches, best_match_scores = FuzzyZeroShotImageClassification._fuzzy_match_labels(
+        None, candidate_labels, labels
+    )
+    expected_matches, expected_scores = _cdist_match_labels(candidate_labels, labels)
+
+    assert best_matches == expected_matches
+    assert list(best_match_scores) == list(expected_scores)
+
+
+def test_fuzzy_match_labels_not_templated():
+    candidate_labels = ["cat", "dgo", "bird"]
+    labels = ["A photo of a cat", "A photo of a dog"]
+
+    best_matches, best_match_scores = FuzzyZeroShotImageClassification._fuzzy_match_labels(
+        None, candidate_labels, labels
+    )
+    expected_matches, expected_scores = _cdist_match_labels(candidate_labels, labels)
+
+    assert best_matches == expected_matches
+    assert list(best_match_scores) == list(expected_scores)
+
+
+def test_call_empty_image_list():
+    classifier = FuzzyZeroShotImageClassification.__new__(FuzzyZeroShotImageClassification)
+    classifier.lang = "en"
+
+    assert classifier([], ["cat", "dog"]) == []
+
+
+def test_encode_text_matches_clip_encode_text():
+    from clip.model import CLIP
+
+    torch.manual_seed(0)
+    model = CLIP(512, 224, 12, 768, 32, 77, 49408, 512, 8, 12).eval()
+    text = clip.tokenize([
+        "A photo of cat",
+        "A photo of a very large orange dog sitting on a mat",
+        "A photo of x",
+        "A photo of two birds",
+        "A photo of sky",
+    ])
+
+    with torch.inference_mode():
+        expected = model.encode_text(text)
+        text_features = FuzzyZeroShotImageClassification._encode_text(types.SimpleNamespace(model=model), text)
+
+    torch.testing.assert_close(text_features, expected, atol=1e-4, rtol=1e-4)